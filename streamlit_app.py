@@ -1,82 +1,107 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import yfinance as yf
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
-from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from tools.cache import FileCache
 
 
 st.set_page_config(page_title="Ações Dashboard", page_icon=":money_with_wings:", layout="wide")
 st.html('styles.html')
 
+file_cache = FileCache(".cache")
 
-def batched(iterable, n_cols):
+# número de pregões exibidos em cada período
+MAPPING_PERIOD = {
+    "Semanal": 5,
+    "Mensal": 22,
+    "Trimestral": 63,
+    "Anual": 252
+}
+
+# tempo, em segundos, em que o histórico do dia corrente é considerado atualizado
+HISTORY_TTL = 300
+
+# colunas numéricas do ticker_df
+NUMERIC_COLS = ("last_price", "previous_day_price", "change", "change_pct")
+
+
+class DataUnavailableError(Exception):
+    """
+    Indica que o yfinance não retornou o dado pedido para um ticker.
+    """
+
+
+def downsample(data, n_points=50):
     """
-    Gera lotes de um iterável, cada lote contendo até n_cols elementos.
+    Reduz uma sequência numérica a no máximo n_points pontos igualmente espaçados.
 
     Parâmetros:
-    iterable (iterable): A sequência de entrada que será dividida em lotes.
-    n_cols (int): O número máximo de elementos em cada lote.
+    data (list, np.ndarray ou pd.Series): Sequência de dados numéricos.
+    n_points (int, opcional): Número máximo de pontos mantidos. Padrão é 50.
 
     Retorno:
-    generator: Um gerador que produz tuplas de elementos do iterável, cada uma contendo até n_cols elementos.
+    np.ndarray: Sequência reduzida, incluindo sempre o primeiro e o último ponto.
 
     Exemplo:
-    >>> list(batched('ABCDEFG', 3))
-    [('A', 'B', 'C'), ('D', 'E', 'F'), ('G',)]
+    >>> downsample(range(10), 4)
+    array([0, 3, 6, 9])
     """
-    if n_cols < 1:
-        raise ValueError("n must be at least one")
+    data = np.asarray(data)
 
-    it = iter(iterable)
+    if len(data) <= n_points:
+        return data
 
-    while batch := tuple(islice(it, n_cols)):
-        yield batch
+    return data[np.linspace(0, len(data) - 1, n_points).astype(int)]
 
 
-def plot_sparkline(data):
+@st.cache_data
+def sparkline_svg(data, width=150, height=40):
     """
-    Cria um gráfico de linha (sparkline) para os dados fornecidos.
+    Gera um gráfico de linha (sparkline) como SVG estático para os dados fornecidos.
 
     Parâmetros:
-    data (list ou pd.Series): Sequência de dados numéricos a serem plotados.
+    data (list, np.ndarray ou pd.Series): Sequência de dados numéricos a serem plotados.
+    width (int, opcional): Largura do viewBox do SVG. Padrão é 150.
+    height (int, opcional): Altura do viewBox do SVG. Padrão é 40.
 
     Retorno:
-    plotly.graph_objects.Figure: Figura Plotly contendo o sparkline.
+    str: Elemento <svg> com a linha do sparkline e o preenchimento até a base.
     """
-    fig_spark = go.Figure(
-        data=go.Scatter(
-            y=data,
-            mode='lines',
-            fill='tozeroy',
-            line=dict(color='red'),
-            fillcolor='pink'
-        )
+    y = downsample(data).astype(float)
+    x = np.linspace(0, width, len(y))
+
+    # normaliza os valores para [0, height], invertendo o eixo pois no SVG o y cresce para baixo
+    y_range = y.max() - y.min()
+    if y_range > 0:
+        y = height - (y - y.min()) / y_range * height
+    else:
+        y = np.full_like(y, height / 2)
+
+    line = "M" + " L".join(f"{x_i:.1f},{y_i:.1f}" for x_i, y_i in zip(x, y))
+    area = f"{line} L{width},{height} L0,{height} Z"
+
+    return (
+        f'<svg viewBox="0 0 {width} {height}" width="100%" height="{height}" preserveAspectRatio="none">'
+        f'<path d="{area}" fill="pink" stroke="none"/>'
+        f'<path d="{line}" fill="none" stroke="red" stroke-width="1.5" vector-effect="non-scaling-stroke"/>'
+        "</svg>"
     )
 
-    fig_spark.update_traces(hovertemplate="Preço: R$ %{y:.2f}")
-    fig_spark.update_xaxes(visible=False, fixedrange=True)
-    fig_spark.update_yaxes(visible=False, fixedrange=True)
-    fig_spark.update_layout(
-        showlegend=False,
-        plot_bgcolor="white",
-        height=50,
-        margin=dict(t=10, l=0, b=0, r=0, pad=0),
-    )
-
-    return fig_spark
-
 
-def display_watchlist_card(ticker, symbol_name, last_price, change_pct, open):
+def display_watchlist_card(ticker, symbol_name, last_price_md, change_pct_md, open):
     """
     Exibe um cartão de observação com informações sobre um ativo.
 
     Parâmetros:
     ticker (str): O símbolo do ticker do ativo.
     symbol_name (str): O nome do símbolo do ativo.
-    last_price (float): O preço atual do ativo.
-    change_pct (float): A variação percentual do preço do ativo.
+    last_price_md (str): O preço atual do ativo, já formatado em markdown.
+    change_pct_md (str): A variação percentual do preço do ativo, já formatada em markdown.
     open (list ou pd.Series): Os preços de abertura do ativo.
 
     Retorno:
@@ -95,15 +120,7 @@ def display_watchlist_card(ticker, symbol_name, last_price, change_pct, open):
         with top_right:
             st.html('<span class="watchlist_ticker"></span>')
             st.markdown(f"{ticker}")
-            negative_gradient = float(change_pct) < 0
-
-            st.markdown(
-                f""":{'red'
-                if negative_gradient
-                else 'green'
-                }[{'▼' if negative_gradient else '▲'}
-                {round(change_pct, 2)} %]"""
-            )
+            st.markdown(change_pct_md)
 
         with bottom_left:
             with st.container():
@@ -112,46 +129,44 @@ def display_watchlist_card(ticker, symbol_name, last_price, change_pct, open):
 
             with st.container():
                 st.html('<span class="watchlist_price_value"></span>')
-                st.markdown(f"R$ {last_price:.2f}")
+                st.markdown(last_price_md)
 
         with bottom_right:
             st.html('<span class="watchlist_bottom_right"></span>')
-            fig_spark = plot_sparkline(open)
-            st.plotly_chart(
-                fig_spark,
-                config=dict(displayModeBar=False),
-                use_container_width=True
-            )
+            st.html(sparkline_svg(open))
 
 
+@st.experimental_fragment
 def display_watchlist(ticker_df):
     """
     Exibe uma lista de observação (watchlist) de ativos em um layout de grade.
 
     Parâmetros:
     ticker_df (pd.DataFrame): DataFrame contendo informações dos ativos.
-        Espera-se que o DataFrame contenha as colunas 'ticker', 'last_price', 'change_pct' e 'Open'.
+        Espera-se que o DataFrame contenha as colunas 'ticker', 'last_price_md', 'change_pct_md' e 'Open'.
 
     Retorno:
     None
     """
     n_cols = 4
 
-    for row in batched(ticker_df.itertuples(), n_cols):
+    rows = ticker_df.to_records(index=False)
+
+    for i in range(0, len(rows), n_cols):
         cols = st.columns(n_cols)
 
-        for col, ticker in zip(cols, row):
-            if ticker:
-                with col:
-                    display_watchlist_card(
-                        ticker.ticker,
-                        ticker.ticker,
-                        ticker.last_price,
-                        ticker.change_pct,
-                        ticker.Open
-                    )
+        for col, ticker in zip(cols, rows[i:i + n_cols]):
+            with col:
+                display_watchlist_card(
+                    ticker.ticker,
+                    ticker.ticker,
+                    ticker.last_price_md,
+                    ticker.change_pct_md,
+                    ticker.Open
+                )
 
 
+@st.experimental_fragment
 def display_overview(ticker_df):
     """
     Formata e exibe um DataFrame com estilos personalizados.
@@ -165,8 +180,8 @@ def display_overview(ticker_df):
     Funções internas:
     - format_currency(val): Formata um valor numérico como moeda.
     - format_percentage(val): Formata um valor numérico como porcentagem.
-    - apply_odd_row_class(row): Aplica uma cor de fundo diferente para linhas ímpares.
-    - format_change(val): Aplica cores diferentes para valores de variação positiva e negativa.
+    - apply_odd_row_class(df): Aplica uma cor de fundo diferente para linhas ímpares.
+    - format_change(col): Aplica cores diferentes para valores de variação positiva e negativa.
     """
     def format_currency(val):
         """
@@ -192,31 +207,36 @@ def display_overview(ticker_df):
         """
         return "{:,.2f} %".format(val)
 
-    def apply_odd_row_class(row):
+    def apply_odd_row_class(df):
         """
         Aplica uma cor de fundo diferente para linhas ímpares.
 
         Parâmetros:
-        row (pd.Series): Linha do DataFrame.
+        df (pd.DataFrame): DataFrame completo.
 
         Retorno:
-        list: Lista de estilos aplicados à linha.
+        pd.DataFrame: Estilos aplicados a cada célula, com o mesmo formato de df.
         """
-        return [
-            "background-color: #f8f8f8" if row.name % 2 != 0 else "" for _ in row
-        ]
+        odd_rows = (np.arange(len(df)) % 2 != 0)[:, np.newaxis]
+        styles = np.where(odd_rows, "background-color: #f8f8f8", "")
+
+        return pd.DataFrame(
+            np.broadcast_to(styles, df.shape),
+            index=df.index,
+            columns=df.columns
+        )
 
-    def format_change(val):
+    def format_change(col):
         """
         Aplica cores diferentes para valores de variação positiva e negativa.
 
         Parâmetros:
-        val (float): Valor de variação.
+        col (pd.Series): Coluna com os valores de variação.
 
         Retorno:
-        str: Estilo de cor aplicado ao valor.
+        np.ndarray: Estilos de cor aplicados a cada valor.
         """
-        return "color: red;" if (val < 0) else "color: green;"
+        return np.where(col < 0, "color: red;", "color: green;")
 
     styled_df = ticker_df.style.format(
         {
@@ -224,14 +244,14 @@ def display_overview(ticker_df):
             "change_pct": format_percentage
         }
     ).apply(
-        apply_odd_row_class, axis=1
-    ).map(
+        apply_odd_row_class, axis=None
+    ).apply(
         format_change, subset=["change_pct"]
     )
 
     st.dataframe(
         styled_df,
-        column_order=[column for column in list(ticker_df.columns)],
+        column_order=[column for column in list(ticker_df.columns) if not column.endswith("_md")],
         column_config={
             "Open": st.column_config.AreaChartColumn(
                 "Últimos 12 meses",
@@ -249,11 +269,11 @@ def display_overview(ticker_df):
 def transform_data(ticker_df, history_dfs):
     """
     Transforma os dados em DataFrames, convertendo colunas específicas para formatos apropriados (datetime e numérico),
-    e adiciona uma nova coluna ao ticker_df.
+    e adiciona ao ticker_df a coluna 'Open' e os textos já formatados exibidos na watchlist.
 
     Parâmetros:
     ticker_df (pd.DataFrame): DataFrame contendo informações dos tickers.
-    history_dfs (dict): Dicionário de DataFrames contendo o histórico de preços dos tickers.
+    history_dfs (pd.DataFrame): DataFrame com o histórico de preços dos tickers, com colunas (ticker, campo).
 
     Retorno:
     tuple: DataFrames transformados (ticker_df, history_dfs).
@@ -263,27 +283,38 @@ def transform_data(ticker_df, history_dfs):
         dayfirst=True
     )
 
-    for col in ["last_price", "previous_day_price", "change", "change_pct"]:
+    for col in NUMERIC_COLS:
         ticker_df[col] = pd.to_numeric(
             ticker_df[col], "coerce"
         )
 
-    for ticker in list(ticker_df["ticker"]):
-        # history_dfs[ticker]["date"] = pd.to_datetime(
-        #     history_dfs[ticker]["date"],
-        #     dayfirst=True
-        # )
+    # o yfinance já entrega colunas numéricas; só convertemos as que vierem como texto
+    obj_cols = history_dfs.select_dtypes("object").columns
+    if len(obj_cols):
+        history_dfs[obj_cols] = history_dfs[obj_cols].apply(
+            pd.to_numeric, errors="coerce"
+        )
 
-        for col in ["Open", "High", "Low", "Close", "Volume", "Adj Close"]:
-            history_dfs[ticker][col] = pd.to_numeric(
-                history_dfs[ticker][col]
-            )
+    # float32 é suficiente para os sparklines e reduz pela metade os bytes serializados
+    opens = history_dfs.xs("Open", axis=1, level=1)
+    ticker_df["Open"] = ticker_df["ticker"].map(
+        lambda t: opens[t].dropna().to_numpy(dtype=np.float32)
+    )
 
-    ticker_to_open = [
-        list(history_dfs[t]["Open"])
-        for t in list(ticker_df["ticker"])
-    ]
-    ticker_df["Open"] = ticker_to_open
+    # textos exibidos nos cartões da watchlist, formatados uma única vez
+    negative_gradient = ticker_df["change_pct"] < 0
+    ticker_df["change_pct_md"] = (
+        pd.Series(np.where(negative_gradient, ":red[▼ ", ":green[▲ "), index=ticker_df.index)
+        + ticker_df["change_pct"].round(2).astype(str)
+        + " %]"
+    )
+    ticker_df["last_price_md"] = ticker_df["last_price"].map("R$ {:.2f}".format)
+
+    # reduz a precisão numérica depois de formatar os textos, diminuindo o payload enviado ao navegador;
+    # só nas colunas com formatação própria em display_overview, pois as demais exibiriam o erro do float32
+    for col in ["last_price", "change_pct"]:
+        ticker_df[col] = pd.to_numeric(ticker_df[col], downcast="float")
+    ticker_df["marketcap"] = pd.to_numeric(ticker_df["marketcap"], downcast="integer")
 
     return ticker_df, history_dfs
 
@@ -295,7 +326,7 @@ def display_symbol_history(ticker_df, history_dfs):
 
     Parâmetros:
     ticker_df (pd.DataFrame): DataFrame contendo informações dos ativos.
-    history_dfs (dict): Dicionário contendo DataFrames de histórico dos ativos, onde as chaves são os tickers.
+    history_dfs (pd.DataFrame): DataFrame com o histórico dos ativos, com colunas (ticker, campo).
 
     Retorno:
     None
@@ -304,31 +335,28 @@ def display_symbol_history(ticker_df, history_dfs):
 
     selected_ticker = left_widget.selectbox(
         ":newspaper: Ativos",
-        list(history_dfs.keys())
+        list(ticker_df["ticker"])
     )
 
     selected_period = right_widget.selectbox(
         ":clock4: Período",
-        ("Semanal", "Mensal", "Trimestral", "Anual"),
+        tuple(MAPPING_PERIOD),
         2
     )
 
-    history_dfs = history_dfs[selected_ticker]
-
-    mapping_period = {
-        "Semanal": 7,
-        "Mensal": 31,
-        "Trimestral": 90,
-        "Anual": 365
-    }
-
-    today = datetime.today().date()
-    delay_days = mapping_period[selected_period]
-    history_dfs = history_dfs[
-        (today - pd.Timedelta(delay_days, unit="d")):today
-    ]
-
-    f_candle = plot_candlestick(history_dfs)
+    # remove as datas em que o ativo não foi negociado, que surgem ao alinhar os tickers;
+    # como os dados são diários e contíguos, o período é recortado por posição,
+    # sem depender da data atual
+    history_dfs = history_dfs[selected_ticker].dropna(how="all").iloc[-MAPPING_PERIOD[selected_period]:]
+
+    f_candle = plot_candlestick(
+        history_dfs,
+        selected_ticker,
+        selected_period,
+        history_dfs.index.min(),
+        history_dfs.index.max(),
+        tuple(history_dfs.iloc[-1])
+    )
 
     left_chart, right_indicator = st.columns([1.5, 1])
 
@@ -340,56 +368,69 @@ def display_symbol_history(ticker_df, history_dfs):
         st.html('<span class="column_indicator"></span>')
         st.subheader("Period Metrics")
 
+        # uma única agregação alimenta todos os indicadores do período
+        stats = history_dfs[["Volume", "Close"]].agg(["min", "max", "mean"])
+
         left_column, right_column = st.columns(2)
 
         with left_column:
             st.html('<span class="low_indicator"></span>')
             st.metric(
                 "Menor volume negociado",
-                f'{history_dfs["Volume"].min():,}'
+                f'{int(stats.loc["min", "Volume"]):,}'
             )
 
             st.metric(
                 "Menor preço de fechamento",
-                f'{history_dfs["Close"].min():,}'
+                f'{stats.loc["min", "Close"]:,}'
             )
 
         with right_column:
             st.html('<span class="high_indicator"></span>')
             st.metric(
                 "Maior volume negociado",
-                f'{history_dfs["Volume"].max():,}'
+                f'{int(stats.loc["max", "Volume"]):,}'
             )
 
             st.metric(
                 "Maior preço de fechamento",
-                f'{history_dfs["Close"].max():,}'
+                f'{stats.loc["max", "Close"]:,}'
             )
 
         with st.container():
             st.html('<span class="bottom_indicator"></span>')
             st.metric(
                 "Média de volume negociado",
-                f'{history_dfs["Volume"].mean():,}'
+                f'{stats.loc["mean", "Volume"]:,}'
             )
 
+            marketcap = ticker_df[ticker_df["ticker"] == selected_ticker][
+                "marketcap"
+            ].values[0]
+
             st.metric(
                 "Atual Market Cap",
-                "{:,} $".format(
-                    ticker_df[ticker_df["ticker"] == selected_ticker][
-                        "marketcap"
-                    ].values[0]
-                ),
+                "{:,} $".format(marketcap) if pd.notna(marketcap) else "Indisponível",
             )
 
 
-def plot_candlestick(history_dfs):
+@st.cache_resource(ttl=HISTORY_TTL)
+def plot_candlestick(_history_dfs, ticker, period, start_date, end_date, last_row):
     """
     Cria um gráfico de candlestick com um gráfico de barras para o volume negociado.
 
+    A mesma instância da figura é devolvida enquanto o recorte não mudar, sem a serialização
+    de cada acesso que o st.cache_data faria; ela não deve ser modificada por quem a recebe.
+
     Parâmetros:
-    history_dfs (pd.DataFrame): DataFrame contendo os dados históricos de preços de ações.
+    _history_dfs (pd.DataFrame): DataFrame contendo os dados históricos de preços de ações.
         Espera-se que o DataFrame contenha as colunas 'Open', 'High', 'Low', 'Close' e 'Volume'.
+        Não entra na chave do cache; o recorte é identificado pelos demais parâmetros.
+    ticker (str): O símbolo do ticker do ativo.
+    period (str): O período selecionado.
+    start_date (pd.Timestamp): Data do primeiro registro do recorte.
+    end_date (pd.Timestamp): Data do último registro do recorte.
+    last_row (tuple): Valores do último registro do recorte, que mudam quando o pregão do dia é atualizado.
 
     Retorno:
     f_candle (plotly.graph_objs._figure.Figure): Objeto Figure do Plotly contendo o gráfico de candlestick.
@@ -404,11 +445,11 @@ def plot_candlestick(history_dfs):
 
     f_candle.add_trace(
         go.Candlestick(
-            x=history_dfs.index,
-            open=history_dfs["Open"],
-            high=history_dfs["High"],
-            low=history_dfs["Low"],
-            close=history_dfs["Close"],
+            x=_history_dfs.index,
+            open=_history_dfs["Open"],
+            high=_history_dfs["High"],
+            low=_history_dfs["Low"],
+            close=_history_dfs["Close"],
             name="Reais",
         ),
         row=1,
@@ -417,8 +458,8 @@ def plot_candlestick(history_dfs):
 
     f_candle.add_trace(
         go.Bar(
-            x=history_dfs.index,
-            y=history_dfs["Volume"],
+            x=_history_dfs.index,
+            y=_history_dfs["Volume"],
             name="Volume Negociado"
         ),
         row=2,
@@ -449,11 +490,165 @@ def plot_candlestick(history_dfs):
     return f_candle
 
 
-@st.cache_data
+@st.cache_resource(ttl=86400, show_spinner=False)
+def get_ticker(ticker):
+    """
+    Retorna o objeto yf.Ticker de um ativo, reaproveitando a instância entre execuções do script.
+
+    A instância é usada apenas para o valor de mercado; o histórico usa uma instância própria,
+    pois as duas buscas rodam em paralelo e o yf.Ticker guarda estado da última consulta de preços.
+
+    Parâmetros:
+    ticker (str): O símbolo do ticker do ativo.
+
+    Retorno:
+    yfinance.Ticker: Objeto Ticker do yfinance.
+    """
+    return yf.Ticker(ticker)
+
+
+def fetch_history(ticker, start_date, end_date, period):
+    """
+    Baixa o histórico de preços de um ticker.
+
+    Usa yf.Ticker.history em vez de yf.download, que guarda estado global e não pode ser
+    chamado de várias threads ao mesmo tempo.
+
+    Parâmetros:
+    ticker (str): O símbolo do ticker do ativo.
+    start_date (str ou datetime): Data de início.
+    end_date (str ou datetime): Data de término (exclusiva).
+    period (str): Frequência dos dados.
+
+    Retorno:
+    pd.DataFrame: DataFrame com o histórico de preços do ticker, vazio se o Yahoo não retornar dados.
+    """
+    history = yf.Ticker(ticker).history(
+        start=start_date,
+        end=end_date,
+        interval=period,
+        auto_adjust=False,
+        actions=False
+    )
+
+    # sem dados (limite de requisições, falha transitória, ativo deslistado) o yfinance
+    # devolve um DataFrame vazio cujo índice não é de datas
+    if history.empty or not isinstance(history.index, pd.DatetimeIndex):
+        return pd.DataFrame()
+
+    history.index = history.index.tz_localize(None)
+
+    return history.dropna(how="all")
+
+
+@st.cache_data(ttl=HISTORY_TTL, show_spinner=False)
+def fetch_ohlcv(ticker, start_date, end_day, period):
+    """
+    Obtém o histórico de preços de um ticker até o dia end_day.
+
+    O histórico é mantido em cache no disco. Para um end_day passado, uma entrada gravada depois dele
+    já está completa e é reaproveitada sem acesso à rede; para o dia corrente, a entrada vale por
+    HISTORY_TTL segundos. Uma entrada desatualizada baixa apenas o trecho final que falta, e a cada
+    7 dias o histórico é baixado novamente por inteiro.
+
+    Parâmetros:
+    ticker (str): O símbolo do ticker do ativo.
+    start_date (str): Data de início no formato 'YYYY-MM-DD'.
+    end_day (datetime.date): Último dia incluído no histórico.
+    period (str): Frequência dos dados.
+
+    Retorno:
+    pd.DataFrame: DataFrame com o histórico de preços do ticker.
+
+    Exceções:
+    DataUnavailableError: Se o yfinance não retornar dados e não houver histórico em disco.
+    """
+    key = (ticker, start_date, period)
+    cached = file_cache.get_frame(key)
+    has_cache = cached is not None and not cached.empty
+
+    # o histórico é baixado por inteiro a cada 7 dias, para que desdobramentos, dividendos
+    # e correções aplicados retroativamente pelo Yahoo alcancem também as linhas antigas
+    needs_full = not has_cache or file_cache.get_value(("full", key), max_age_days=7) is None
+
+    if not needs_full:
+        modified = file_cache.modified_at(key)
+
+        if end_day < date.today():
+            is_fresh = modified.date() > end_day
+        else:
+            is_fresh = (datetime.now() - modified).total_seconds() < HISTORY_TTL
+
+        if is_fresh:
+            return cached
+
+    # o fim é exclusivo no yfinance, então pedimos até o dia seguinte para incluir end_day
+    end_date = end_day + timedelta(days=1)
+
+    if needs_full:
+        history = fetch_history(ticker, start_date, end_date, period)
+
+        if history.empty:
+            if has_cache:
+                return cached
+
+            raise DataUnavailableError(f"Histórico indisponível para {ticker}")
+
+        file_cache.set_value(("full", key), True)
+    else:
+        tail = fetch_history(ticker, cached.index[-1], end_date, period)
+
+        # se o trecho final não vier, mantemos o histórico já gravado em disco
+        if tail.empty:
+            return cached
+
+        history = pd.concat([cached, tail])
+        history = history[~history.index.duplicated(keep="last")]
+
+    file_cache.set_frame(key, history)
+
+    return history
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def fetch_marketcap(ticker):
+    """
+    Obtém o valor de mercado de um ticker, reaproveitando o cache em disco por até um dia.
+
+    Parâmetros:
+    ticker (str): O símbolo do ticker do ativo.
+
+    Retorno:
+    int: Valor de mercado do ativo.
+
+    Exceções:
+    DataUnavailableError: Se o yfinance não informar o valor de mercado.
+    """
+    key = ("marketcap", ticker)
+    marketcap = file_cache.get_value(key, max_age_days=1)
+
+    if marketcap is None:
+        # fast_info consulta um endpoint leve, em vez do JSON completo de .info
+        marketcap = get_ticker(ticker).fast_info.market_cap
+
+        # sem a quantidade de ações o yfinance não calcula o valor de mercado
+        if marketcap is None:
+            raise DataUnavailableError(f"Valor de mercado indisponível para {ticker}")
+
+        marketcap = int(marketcap)
+        file_cache.set_value(key, marketcap)
+
+    return marketcap
+
+
 def download_data(tickers, start_date, end_date=datetime.now(), period="1d"):
     """
     Baixa dados históricos de preços para uma lista de tickers e calcula métricas financeiras.
 
+    O histórico e o valor de mercado são obtidos e mantidos em cache por ticker, de forma que
+    adicionar ou remover um ticker só busca os dados que ainda não estão em cache. Tickers sem
+    histórico disponível são descartados com um aviso.
+
     Parâmetros:
     tickers (list): Lista de tickers para os quais os dados serão baixados.
     start_date (str): Data de início no formato 'YYYY-MM-DD'.
@@ -461,34 +656,78 @@ def download_data(tickers, start_date, end_date=datetime.now(), period="1d"):
     period (str, opcional): Frequência dos dados. Padrão é '1d' (diário).
 
     Retorno:
-    tuple: Contém um DataFrame com os dados dos tickers e um dicionário com os dados históricos para cada ticker.
+    tuple: Contém um DataFrame com os dados dos tickers e um DataFrame com os dados históricos de todos os tickers,
+        com colunas MultiIndex (ticker, campo).
     """
-    history_dfs = {}
-    ticker_data = []
-    for ticker in tickers:
-        data = yf.download(ticker, start=start_date, end=end_date, period=period)
-        history_dfs[ticker] = data
-        last_trade_time = data.index[-1]
-        last_price = data['Close'].iloc[-1]
-        # calcula o preço de fechamento do dia anterior
-        previous_day_price = data['Close'].iloc[-2] if len(data) > 1 else last_price
-        change = last_price - previous_day_price
-        change_pct = (change / previous_day_price) * 100
-
-        marketcap = yf.Ticker(ticker).info
-        marketcap = marketcap['marketCap']
-
-        ticker_data.append({
-            'ticker': ticker,
-            'last_trade_time': last_trade_time,
-            'last_price': last_price,
-            'previous_day_price': previous_day_price,
-            'change': change,
-            'change_pct': change_pct,
-            'marketcap': marketcap,
-        })
-
-    ticker_df = pd.DataFrame(ticker_data)
+    end_day = pd.Timestamp(end_date).date()
+
+    def history_or_none(ticker):
+        """
+        Obtém o histórico de um ticker, ou None se ele estiver indisponível.
+        """
+        try:
+            return fetch_ohlcv(ticker, start_date, end_day, period)
+        except DataUnavailableError:
+            return None
+
+    def marketcap_or_none(ticker):
+        """
+        Obtém o valor de mercado de um ticker, ou None se ele estiver indisponível.
+        """
+        try:
+            return fetch_marketcap(ticker)
+        except DataUnavailableError:
+            return None
+
+    # As buscas por ticker são independentes e limitadas por rede, então rodam em paralelo.
+    # As threads recebem o contexto da execução atual para poderem usar o cache do Streamlit.
+    with ThreadPoolExecutor(
+        max_workers=10,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    ) as executor:
+        histories = executor.map(history_or_none, tickers)
+        marketcaps = executor.map(marketcap_or_none, tickers)
+
+        histories = dict(zip(tickers, histories))
+        marketcaps = dict(zip(tickers, marketcaps))
+
+    unavailable = [ticker for ticker in tickers if histories[ticker] is None]
+    if unavailable:
+        st.warning(f"Histórico indisponível para: {', '.join(unavailable)}")
+
+    tickers = [ticker for ticker in tickers if histories[ticker] is not None]
+    if not tickers:
+        st.error("Nenhum histórico de preços disponível no momento.")
+        st.stop()
+
+    history_dfs = {
+        ticker: histories[ticker].loc[:pd.Timestamp(end_date)]
+        for ticker in tickers
+    }
+
+    # matriz (n_tickers, 2) com os dois últimos fechamentos de cada ticker; com um único
+    # registro, o fechamento do dia anterior é o próprio último fechamento
+    closes = np.vstack([
+        history_dfs[ticker]["Close"].to_numpy()[[max(len(history_dfs[ticker]) - 2, 0), -1]]
+        for ticker in tickers
+    ])
+    previous_day_price = closes[:, 0]
+    last_price = closes[:, 1]
+    change = last_price - previous_day_price
+
+    ticker_df = pd.DataFrame({
+        'ticker': tickers,
+        'last_trade_time': [history_dfs[ticker].index[-1] for ticker in tickers],
+        'last_price': last_price,
+        'previous_day_price': previous_day_price,
+        'change': change,
+        'change_pct': change / previous_day_price * 100,
+        'marketcap': pd.array([marketcaps[ticker] for ticker in tickers], dtype="Int64"),
+    })
+
+    # um único DataFrame largo é serializado pelo cache de forma mais eficiente que um dicionário de DataFrames
+    history_dfs = pd.concat(history_dfs, axis=1)
 
     return ticker_df, history_dfs
 
@@ -0,0 +1,128 @@
+import hashlib
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+
+class FileCache:
+    """
+    Cache em disco para resultados do yfinance.
+
+    Cada entrada é identificada por uma chave (tupla) cujo hash md5 define o nome do arquivo.
+    DataFrames são gravados em parquet e valores simples em JSON.
+
+    Parâmetros:
+    directory (str ou Path): Diretório onde os arquivos de cache são gravados. Padrão é '.cache'.
+    """
+
+    def __init__(self, directory=".cache"):
+        self.directory = Path(directory)
+
+    def path(self, key, suffix=".parquet"):
+        """
+        Retorna o caminho do arquivo correspondente a uma chave.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        suffix (str, opcional): Extensão do arquivo. Padrão é '.parquet'.
+
+        Retorno:
+        Path: Caminho do arquivo de cache.
+        """
+        digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}{suffix}"
+
+    def modified_at(self, key, suffix=".parquet"):
+        """
+        Retorna o momento em que a entrada foi gravada pela última vez.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        suffix (str, opcional): Extensão do arquivo. Padrão é '.parquet'.
+
+        Retorno:
+        datetime.datetime ou None: Data e hora da última gravação, ou None se a entrada não existir.
+        """
+        path = self.path(key, suffix)
+        if not path.exists():
+            return None
+
+        return datetime.fromtimestamp(path.stat().st_mtime)
+
+    def modified_date(self, key, suffix=".parquet"):
+        """
+        Retorna o dia em que a entrada foi gravada pela última vez.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        suffix (str, opcional): Extensão do arquivo. Padrão é '.parquet'.
+
+        Retorno:
+        datetime.date ou None: Data da última gravação, ou None se a entrada não existir.
+        """
+        modified = self.modified_at(key, suffix)
+
+        return None if modified is None else modified.date()
+
+    def get_frame(self, key):
+        """
+        Lê um DataFrame do cache.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+
+        Retorno:
+        pd.DataFrame ou None: DataFrame armazenado, ou None se a entrada não existir.
+        """
+        path = self.path(key)
+        if not path.exists():
+            return None
+
+        return pd.read_parquet(path)
+
+    def set_frame(self, key, df):
+        """
+        Grava um DataFrame no cache.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        df (pd.DataFrame): DataFrame a ser armazenado.
+
+        Retorno:
+        None
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(self.path(key))
+
+    def get_value(self, key, max_age_days=1):
+        """
+        Lê um valor simples do cache, desde que não esteja expirado.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        max_age_days (int, opcional): Idade máxima da entrada, em dias de calendário. Padrão é 1.
+
+        Retorno:
+        object ou None: Valor armazenado, ou None se a entrada não existir ou estiver expirada.
+        """
+        modified = self.modified_date(key, ".json")
+        if modified is None or (date.today() - modified).days >= max_age_days:
+            return None
+
+        return json.loads(self.path(key, ".json").read_text())
+
+    def set_value(self, key, value):
+        """
+        Grava um valor simples (serializável em JSON) no cache.
+
+        Parâmetros:
+        key (tuple): Chave que identifica a entrada no cache.
+        value (object): Valor a ser armazenado.
+
+        Retorno:
+        None
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path(key, ".json").write_text(json.dumps(value))